@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from typing import List, Dict
+
+import httpx
+
+# lxml's C parser is much faster; the stdlib ElementTree has the same API
+try:
+    import lxml.etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+PAPER_DIR = "papers"
+CACHE_DIR = os.path.join(PAPER_DIR, ".cache")
+CACHE_MAX_AGE = 24 * 3600  # seconds before a cached search is considered stale
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+ARXIV_MAX_PAGE_SIZE = 2000  # largest page the arXiv API will serve
+ARXIV_NUM_RETRIES = 3  # extra attempts after a transient failure, like arxiv.Client
+ARXIV_RETRY_DELAY = 3  # seconds before the first retry, doubled each time
+ARXIV_TIMEOUT = 30.0  # httpx timeout per attempt
+# Worst case for one fetch: every attempt times out, plus all the backoff sleeps
+ARXIV_MAX_FETCH_TIME = (ARXIV_NUM_RETRIES + 1) * ARXIV_TIMEOUT + ARXIV_RETRY_DELAY * (2 ** ARXIV_NUM_RETRIES - 1)
+# Seconds before a leftover .lock file is treated as abandoned; doubled because
+# httpx's timeout is per network operation, so a slow attempt can run longer
+LOCK_TIMEOUT = 2 * ARXIV_MAX_FETCH_TIME
+
+ATOM_NS = {
+    'atom': "http://www.w3.org/2005/Atom",
+    'arxiv': "http://arxiv.org/schemas/atom",
+}
+
+
+class NoResultsError(Exception):
+    """arXiv returned no papers; raised so no cache tier stores the empty result"""
+
+
+def _parse_entry(entry) -> Dict:
+    """Turn one Atom <entry> into the paper dict used throughout the app"""
+    names = [author.findtext('atom:name', namespaces=ATOM_NS) for author in entry.iterfind('atom:author', ATOM_NS)]
+    pdf_url = next(
+        (link.get('href') for link in entry.iterfind('atom:link', ATOM_NS) if link.get('title') == 'pdf'),
+        None
+    )
+    primary = entry.find('arxiv:primary_category', ATOM_NS)
+    return {
+        'id': entry.findtext('atom:id', namespaces=ATOM_NS).split('arxiv.org/abs/')[-1],
+        'title': re.sub(r"\s+", " ", entry.findtext('atom:title', default="", namespaces=ATOM_NS)).strip(),
+        'authors': names,
+        'authors_str': ', '.join(names),
+        'summary': entry.findtext('atom:summary', default="", namespaces=ATOM_NS).strip(),
+        'pdf_url': pdf_url,
+        'published': entry.findtext('atom:published', default="", namespaces=ATOM_NS)[:10],
+        'categories': [category.get('term') for category in entry.iterfind('atom:category', ATOM_NS)],
+        'primary_category': primary.get('term') if primary is not None else None
+    }
+
+
+def _search_papers_uncached(topic: str, max_results: int) -> List[Dict]:
+    """Query arXiv and return structured paper data"""
+    # One right-sized page; results are parsed straight from the Atom feed
+    params = {
+        'search_query': topic,
+        'start': 0,
+        'max_results': max(1, min(max_results, ARXIV_MAX_PAGE_SIZE)),
+        'sortBy': 'relevance',
+        'sortOrder': 'descending',
+    }
+    delay = ARXIV_RETRY_DELAY
+    for attempt in range(ARXIV_NUM_RETRIES + 1):
+        try:
+            response = httpx.get(ARXIV_API_URL, params=params, timeout=ARXIV_TIMEOUT)
+            response.raise_for_status()
+            break
+        except httpx.HTTPError as e:
+            # Only connection errors, 429 and 5xx are worth retrying
+            transient = not isinstance(e, httpx.HTTPStatusError) or \
+                e.response.status_code == 429 or e.response.status_code >= 500
+            if not transient or attempt == ARXIV_NUM_RETRIES:
+                raise
+            time.sleep(delay)
+            delay *= 2
+
+    root = ET.fromstring(response.content)
+    return [
+        _parse_entry(entry)
+        for entry in root.iterfind('atom:entry', ATOM_NS)
+        # A malformed query comes back as a single error entry
+        if '/api/errors' not in entry.findtext('atom:id', default="", namespaces=ATOM_NS)
+    ][:max_results]
+
+
+def _cache_path(topic: str, max_results: int) -> str:
+    key = hashlib.sha1(f"{topic}|{max_results}".encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def _read_cache(path: str, max_age: float = CACHE_MAX_AGE):
+    """Return cached papers if the file exists and is fresh, else None"""
+    try:
+        if time.time() - os.path.getmtime(path) > max_age:
+            return None
+        with open(path, "r") as json_file:
+            # An empty list can be left by older versions; refetch it
+            return json.load(json_file) or None
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _write_cache(path: str, papers_data: List[Dict]):
+    """Atomically write papers to the cache file"""
+    # A unique temp file so concurrent writers never share one
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as json_file:
+            json.dump(papers_data, json_file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _acquire_lock(lock_path: str) -> bool:
+    """Try to create the lock file, clearing it first if it was abandoned"""
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+        return True
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        return False
+
+
+def search_arxiv(topic: str, max_results: int) -> List[Dict]:
+    """Search arXiv, serving repeat queries from the disk cache"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(topic, max_results)
+    lock_path = f"{path}.lock"
+
+    # Another process may already be fetching this query; wait for its result
+    while True:
+        cached = _read_cache(path)
+        if cached is not None:
+            return cached
+        if _acquire_lock(lock_path):
+            break
+        time.sleep(0.5)
+
+    try:
+        papers_data = _search_papers_uncached(topic, max_results)
+        if not papers_data:
+            # arXiv occasionally answers 200 with an empty feed; don't pin that
+            raise NoResultsError(topic)
+        _write_cache(path, papers_data)
+        return papers_data
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
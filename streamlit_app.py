@@ -1,13 +1,44 @@
 import streamlit as st
 import asyncio
+import importlib.util
 import json
+import logging
 import os
+import queue
+import re
+import tempfile
+import threading
+from collections import Counter
 from datetime import datetime
-from anthropic import Anthropic
+from itertools import chain
+import httpx
+import numpy as np
+from anthropic import Anthropic, AsyncAnthropic
 from dotenv import load_dotenv
-import arxiv
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from arxiv_cache import PAPER_DIR, NoResultsError, search_arxiv
+
+try:
+    import orjson
+    
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+    
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+    
+    _json_loads = json.loads
+
+# Optional local embedding model for ranking chat context
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -25,62 +56,266 @@ if 'papers_data' not in st.session_state:
     st.session_state.papers_data = {}
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
+if 'pending_questions' not in st.session_state:
+    st.session_state.pending_questions = []
+if 'paper_summaries' not in st.session_state:
+    st.session_state.paper_summaries = {}
 if 'anthropic_client' not in st.session_state:
     st.session_state.anthropic_client = None
 
 # Constants
-PAPER_DIR = "papers"
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+EMBEDDINGS_PATH = os.path.join(PAPER_DIR, "embeddings.f16.bin")
+EMBEDDING_IDS_PATH = os.path.join(PAPER_DIR, "ids.txt")
+# The memory tier's TTL starts when it loads an entry, which may already be
+# nearly CACHE_MAX_AGE old on disk; keeping it short bounds total staleness
+# to CACHE_MAX_AGE + SEARCH_MEMORY_TTL
+SEARCH_MEMORY_TTL = 3600
+ANSWER_MODELS = ["claude-3-sonnet-20240229", "claude-3-haiku-20240307"]
+ROUTING_MODELS = ["claude-3-haiku-20240307", "claude-3-sonnet-20240229"]
 os.makedirs(PAPER_DIR, exist_ok=True)
 
+# Matches the "### Answer N" headings that delimit a batch reply
+ANSWER_HEADING_RE = re.compile(r"^#+\s*Answer\s+(\d+)\s*$", re.MULTILINE)
+
+def _split_batch_answers(text: str) -> Dict[int, str]:
+    """Split a batch reply on its answer headings, taking them strictly in order"""
+    answers = {}
+    expected, current, start = 1, None, 0
+    for match in ANSWER_HEADING_RE.finditer(text):
+        # A heading out of sequence is part of an answer, not a delimiter
+        if int(match.group(1)) != expected:
+            continue
+        if current is not None:
+            answers[current] = text[start:match.start()].strip()
+        current, start = expected, match.end()
+        expected += 1
+    if current is not None:
+        answers[current] = text[start:].strip()
+    return answers
+
+def build_papers_context(papers: List[Dict], query: str = "") -> str:
+    """Build a short context block from the results most relevant to the query"""
+    if not papers:
+        return ""
+    context = "Here are some recent papers I found:\n\n"
+    for paper in rank_papers(papers, query):  # Use top 3 papers for context
+        context += f"- {paper['title']} by {paper['authors_str']}\n"
+        context += f"  Summary: {paper['summary'][:200]}...\n\n"
+    return context
+
+@st.cache_data(ttl=SEARCH_MEMORY_TTL, max_entries=256, show_spinner=False)
+def search_papers_cached(topic: str, max_results: int) -> List[Dict]:
+    """In-memory tier over the on-disk arXiv search cache"""
+    # Empty results raise NoResultsError, which st.cache_data never stores
+    return search_arxiv(topic, max_results)
+
+@st.cache_resource
+def _get_embedder():
+    """Load the sentence embedding model once, or None if it isn't installed"""
+    if SentenceTransformer is None:
+        return None
+    try:
+        return SentenceTransformer(EMBEDDING_MODEL)
+    except Exception:
+        logger.exception("Error loading embedding model %s", EMBEDDING_MODEL)
+        return None
+
+def _embed(texts: List[str]) -> np.ndarray:
+    """Embed texts as unit-length float32 rows so a dot product is cosine similarity"""
+    return _get_embedder().encode(texts, normalize_embeddings=True).astype(np.float32)
+
+def _read_embedding_ids() -> List[str]:
+    """Paper ids in row order of the shared embedding matrix"""
+    try:
+        with open(EMBEDDING_IDS_PATH, "r") as ids_file:
+            return ids_file.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+def _append_embeddings(papers_info: Dict[str, Dict]):
+    """Embed papers not yet in the shared matrix and append them as float16 rows"""
+    ids = _read_embedding_ids()
+    known = set(ids)
+    new_ids = [paper_id for paper_id in papers_info if paper_id not in known]
+    if not new_ids:
+        return
+    vectors = _embed([papers_info[paper_id]['summary'] for paper_id in new_ids])
+    
+    # Rows go in first and ids.txt is appended last, so an interrupted write
+    # only leaves unreferenced bytes, which the truncate drops next time.
+    # n counts id lines, not distinct ids, so row i always matches line i and
+    # the truncate never cuts into rows a live read-only memmap still maps
+    n, k = len(ids), len(new_ids)
+    with open(EMBEDDINGS_PATH, "ab"):
+        pass
+    os.truncate(EMBEDDINGS_PATH, (n + k) * EMBEDDING_DIM * np.dtype(np.float16).itemsize)
+    emb = np.memmap(EMBEDDINGS_PATH, dtype=np.float16, mode='r+', shape=(n + k, EMBEDDING_DIM))
+    emb[n:] = vectors.astype(np.float16)
+    emb.flush()
+    del emb
+    
+    with open(EMBEDDING_IDS_PATH, "a") as ids_file:
+        ids_file.write("".join(f"{paper_id}\n" for paper_id in new_ids))
+
+@st.cache_resource
+def _load_embeddings() -> Tuple[Dict[str, int], np.ndarray]:
+    """Map saved paper ids to rows of the memory-mapped embedding matrix"""
+    ids = _read_embedding_ids()
+    if not ids:
+        return {}, None
+    emb = np.memmap(EMBEDDINGS_PATH, dtype=np.float16, mode='r', shape=(len(ids), EMBEDDING_DIM))
+    return {paper_id: row for row, paper_id in enumerate(ids)}, emb
+
+def rank_papers(papers: List[Dict], query: str, k: int = 3) -> List[Dict]:
+    """Return the k papers whose summaries are most similar to the query"""
+    if not papers or not query or _get_embedder() is None:
+        return papers[:k]
+    
+    try:
+        rows, emb = _load_embeddings()
+    except (OSError, ValueError):
+        # ids.txt without a matching embeddings.f16.bin (missing or too short);
+        # raising out of the cached loader keeps the failure from being cached
+        logger.warning("Embedding store in %s is inconsistent; using search order", PAPER_DIR)
+        return papers[:k]
+    
+    known = [paper for paper in papers if paper['id'] in rows]
+    if not known:
+        return papers[:k]
+    
+    q = _embed([query])[0]
+    # Only the pages holding these rows are read from the memmap
+    scores = emb[[rows[paper['id']] for paper in known]].astype(np.float32) @ q
+    ranked = [known[i] for i in np.argsort(-scores)]
+    # Papers still waiting on the writer keep their search order at the end
+    ranked += [paper for paper in papers if paper['id'] not in rows]
+    return ranked[:k]
+
+@st.cache_resource
+def _build_paper_index() -> Dict[str, Dict]:
+    """Map every saved paper id to its record across all topic folders"""
+    index = {}
+    for item in os.listdir(PAPER_DIR):
+        file_path = os.path.join(PAPER_DIR, item, "papers_info.json")
+        if os.path.isfile(file_path):
+            try:
+                with open(file_path, "rb") as json_file:
+                    papers_info = _json_loads(json_file.read())
+            except (OSError, ValueError):
+                continue
+            # First folder wins, matching the old directory-scan order
+            for paper_id, info in papers_info.items():
+                index.setdefault(paper_id, info)
+    return index
+
+@st.cache_data(ttl=30)
+def _list_topics() -> List[str]:
+    """List saved topic folders, skipping hidden ones like the search cache"""
+    with os.scandir(PAPER_DIR) as it:
+        return [e.name for e in it if e.is_dir() and not e.name.startswith('.')]
+
+@st.cache_resource(max_entries=16)
+def _papers_df(papers_data: List[Dict]) -> pd.DataFrame:
+    """Build the analysis frame once per distinct result set (treat as read-only)"""
+    return pd.DataFrame(papers_data)
+
+@st.cache_data(max_entries=16)
+def _papers_csv(papers_data: List[Dict]) -> bytes:
+    """Serialize papers to CSV once per distinct result set"""
+    return pd.DataFrame(papers_data).to_csv(index=False).encode()
+
+def _writer_loop(write_q: queue.Queue):
+    """Write queued (path, payload) items to disk off the request thread"""
+    while True:
+        file_path, papers_info = write_q.get()
+        try:
+            # Write then rename, so the index builder never reads a half-written file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as json_file:
+                    json_file.write(_json_dumps(papers_info))
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            # Pick up the new papers and topic on the next lookup
+            _build_paper_index.clear()
+            _list_topics.clear()
+            
+            if _get_embedder() is not None:
+                _append_embeddings(papers_info)
+                _load_embeddings.clear()
+        except Exception:
+            # No script context on this thread, so st.error isn't available
+            logger.exception("Error saving %s", file_path)
+        finally:
+            write_q.task_done()
+
+@st.cache_resource
+def _get_write_queue() -> queue.Queue:
+    # Cached so reruns of this script share one queue and one writer thread
+    write_q = queue.Queue()
+    threading.Thread(target=_writer_loop, args=(write_q,), daemon=True).start()
+    return write_q
+
+async def _summarize_all(papers: List[Dict], model: str, concurrency: int = 5) -> List[str]:
+    """Summarize every paper with one concurrent Claude request each"""
+    sem = asyncio.Semaphore(concurrency)
+    
+    async with AsyncAnthropic(http_client=httpx.AsyncClient(http2=HTTP2_AVAILABLE, timeout=60.0)) as client:
+        async def one(paper: Dict) -> str:
+            async with sem:
+                try:
+                    response = await client.messages.create(
+                        model=model,
+                        max_tokens=300,
+                        messages=[{"role": "user", "content": f"Summarize: {paper['summary']}"}]
+                    )
+                    return response.content[0].text
+                except Exception as e:
+                    return f"❌ Error calling Claude: {str(e)}"
+        
+        return await asyncio.gather(*[one(paper) for paper in papers])
+
 class StreamlitResearchAssistant:
     def __init__(self):
         self.anthropic = None
         if os.getenv("ANTHROPIC_API_KEY"):
             try:
-                self.anthropic = Anthropic()
+                # One pooled client for the lifetime of the cached assistant,
+                # so chat turns reuse the same TLS connection
+                self.anthropic = Anthropic(http_client=httpx.Client(
+                    http2=HTTP2_AVAILABLE,
+                    timeout=60.0,
+                    limits=httpx.Limits(max_keepalive_connections=10, max_connections=20)
+                ))
             except Exception as e:
                 st.error(f"Failed to initialize Anthropic client: {e}")
     
     def search_papers(self, topic: str, max_results: int = 5) -> List[Dict]:
         """Search for papers on arXiv and return structured data"""
         try:
-            # Use arxiv to find papers
-            client = arxiv.Client()
-            search = arxiv.Search(
-                query=topic,
-                max_results=max_results,
-                sort_by=arxiv.SortCriterion.Relevance
-            )
-            
-            papers = client.results(search)
-            
-            # Process papers
-            papers_data = []
-            for paper in papers:
-                paper_info = {
-                    'id': paper.get_short_id(),
-                    'title': paper.title,
-                    'authors': [author.name for author in paper.authors],
-                    'authors_str': ', '.join([author.name for author in paper.authors]),
-                    'summary': paper.summary,
-                    'pdf_url': paper.pdf_url,
-                    'published': str(paper.published.date()),
-                    'categories': paper.categories,
-                    'primary_category': paper.primary_category
-                }
-                papers_data.append(paper_info)
+            # Repeat searches are served from the in-memory/disk cache
+            papers_data = search_papers_cached(topic, max_results)
             
             # Save to local storage
             self.save_papers_to_file(topic, papers_data)
             
             return papers_data
             
+        except NoResultsError:
+            # Nothing to save; the search tab shows its own "No papers found" warning
+            return []
         except Exception as e:
             st.error(f"Error searching papers: {str(e)}")
             return []
     
     def save_papers_to_file(self, topic: str, papers_data: List[Dict]):
-        """Save papers data to local JSON file"""
+        """Queue papers data to be saved to local JSON file"""
         try:
             topic_dir = topic.lower().replace(" ", "_")
             path = os.path.join(PAPER_DIR, topic_dir)
@@ -99,8 +334,8 @@ class StreamlitResearchAssistant:
                     'published': paper['published']
                 }
             
-            with open(file_path, "w") as json_file:
-                json.dump(papers_info, json_file, indent=2)
+            # Written by the background writer thread
+            _get_write_queue().put((file_path, papers_info))
                 
         except Exception as e:
             st.error(f"Error saving papers: {str(e)}")
@@ -108,38 +343,95 @@ class StreamlitResearchAssistant:
     def get_paper_info(self, paper_id: str) -> Dict:
         """Extract paper information from local storage"""
         try:
-            for item in os.listdir(PAPER_DIR):
-                item_path = os.path.join(PAPER_DIR, item)
-                if os.path.isdir(item_path):
-                    file_path = os.path.join(item_path, "papers_info.json")
-                    if os.path.isfile(file_path):
-                        with open(file_path, "r") as json_file:
-                            papers_info = json.load(json_file)
-                            if paper_id in papers_info:
-                                return papers_info[paper_id]
-            return None
+            return _build_paper_index().get(paper_id)
         except Exception as e:
             st.error(f"Error retrieving paper info: {str(e)}")
             return None
     
-    def chat_with_claude(self, message: str, context: str = "") -> str:
-        """Chat with Claude using the Anthropic API"""
+    def chat_with_claude(self, message: str, context: str = "", placeholder=None,
+                         model: str = "claude-3-sonnet-20240229", max_tokens: int = 1000) -> str:
+        """Chat with Claude, streaming the reply into placeholder as it arrives"""
         if not self.anthropic:
             return "❌ Anthropic API not configured. Please set ANTHROPIC_API_KEY in your .env file."
         
         try:
             full_message = f"{context}\n\n{message}" if context else message
             
+            buf = ""
+            with self.anthropic.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                messages=[{"role": "user", "content": full_message}]
+            ) as stream:
+                for text in stream.text_stream:
+                    buf += text
+                    if placeholder is not None:
+                        placeholder.markdown(buf)
+            
+            return buf
+            
+        except Exception as e:
+            return f"❌ Error calling Claude: {str(e)}"
+
+    def chat_with_claude_batch(self, questions: List[str], context: str = "",
+                               model: str = "claude-3-sonnet-20240229") -> List[str]:
+        """Answer several questions in one request so the shared context is sent once"""
+        if not self.anthropic:
+            return ["❌ Anthropic API not configured. Please set ANTHROPIC_API_KEY in your .env file."] * len(questions)
+        
+        try:
+            numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+            full_message = (
+                f"{context}\n\n" if context else ""
+            ) + (
+                "Answer each of the following numbered questions separately. "
+                "Start each answer with a line containing only \"### Answer N\", "
+                "where N is the question's number:\n\n" + numbered
+            )
+            
             response = self.anthropic.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=1000,
+                model=model,
+                max_tokens=min(4096, 1000 * len(questions)),
                 messages=[{"role": "user", "content": full_message}]
             )
+            text = response.content[0].text
             
-            return response.content[0].text
+            answers = _split_batch_answers(text)
+            if not answers:
+                # Claude ignored the headings; keep the whole reply on the first question
+                return [text] + ["❌ No separate answer returned."] * (len(questions) - 1)
+            return [answers.get(i, "❌ No separate answer returned.") for i in range(1, len(questions) + 1)]
             
         except Exception as e:
-            return f"❌ Error calling Claude: {str(e)}"
+            return [f"❌ Error calling Claude: {str(e)}"] * len(questions)
+    
+    def summarize_papers(self, papers: List[Dict], model: str = "claude-3-sonnet-20240229") -> List[str]:
+        """Summarize each paper with Claude, running the requests concurrently"""
+        if not self.anthropic:
+            return ["❌ Anthropic API not configured. Please set ANTHROPIC_API_KEY in your .env file."] * len(papers)
+        
+        return asyncio.run(_summarize_all(papers, model=model))
+    
+    def route_paper(self, message: str, papers: List[Dict], model: str = "claude-3-haiku-20240307") -> Dict:
+        """Ask a fast model which paper is most relevant to the message"""
+        if not self.anthropic or not papers:
+            return None
+        
+        titles = "\n".join(f"{i}. {paper['title']}" for i, paper in enumerate(papers, 1))
+        route = self.chat_with_claude(
+            f"Which of these papers is most relevant to: {message}\n{titles}\n\n"
+            "Reply with the number of the paper only.",
+            model=model,
+            max_tokens=10
+        )
+        
+        match = None if route.startswith("❌") else re.search(r"\d+", route)
+        if match and 1 <= int(match.group()) <= len(papers):
+            return papers[int(match.group()) - 1]
+        return None
+
+def _clear_chat():
+    st.session_state.chat_history = []
 
 # Initialize the research assistant
 @st.cache_resource
@@ -169,10 +461,16 @@ with st.sidebar:
     st.subheader("🔍 Search Settings")
     max_results = st.slider("Max Results", 1, 20, 5)
     
+    # Models
+    st.subheader("🤖 Models")
+    answer_model = st.selectbox("Answer model", ANSWER_MODELS)
+    routing_model = st.selectbox("Routing model", ROUTING_MODELS,
+                                 help="Fast model used to pick the paper each chat question is about")
+    
     # Saved Topics
     st.subheader("📁 Saved Topics")
     if os.path.exists(PAPER_DIR):
-        topics = [d for d in os.listdir(PAPER_DIR) if os.path.isdir(os.path.join(PAPER_DIR, d))]
+        topics = _list_topics()
         if topics:
             for topic in topics:
                 if st.button(f"📚 {topic.replace('_', ' ').title()}", key=f"topic_{topic}"):
@@ -217,6 +515,21 @@ with tab1:
                         st.write(paper['summary'])
             else:
                 st.warning("No papers found. Try a different search term.")
+    
+    # Claude summaries of the current results
+    if st.session_state.papers_data:
+        if st.button("✨ Summarize all with Claude"):
+            papers = st.session_state.papers_data
+            with st.spinner(f"Summarizing {len(papers)} papers..."):
+                summaries = assistant.summarize_papers(papers, model=answer_model)
+            st.session_state.paper_summaries = {
+                paper['id']: summary for paper, summary in zip(papers, summaries)
+            }
+        
+        for paper in st.session_state.papers_data:
+            if paper['id'] in st.session_state.paper_summaries:
+                with st.expander(f"✨ {paper['title']}"):
+                    st.write(st.session_state.paper_summaries[paper['id']])
 
 with tab2:
     st.header("Chat with Claude")
@@ -230,82 +543,111 @@ with tab2:
             with st.chat_message(message["role"]):
                 st.markdown(message["content"])
     
+    batch_mode = st.toggle("Batch mode", help="Queue questions and answer them in a single request")
+    
     # Chat input
     if prompt := st.chat_input("Ask about research papers or any topic..."):
-        # Add user message to chat history
-        st.session_state.chat_history.append({"role": "user", "content": prompt})
-        
-        # Prepare context from current papers
-        context = ""
-        if st.session_state.papers_data:
-            context = "Here are some recent papers I found:\n\n"
-            for paper in st.session_state.papers_data[:3]:  # Use top 3 papers for context
-                context += f"- {paper['title']} by {paper['authors_str']}\n"
-                context += f"  Summary: {paper['summary'][:200]}...\n\n"
-        
-        # Get Claude's response
-        with st.spinner("Claude is thinking..."):
-            response = assistant.chat_with_claude(prompt, context)
-        
-        # Add assistant response to chat history
-        st.session_state.chat_history.append({"role": "assistant", "content": response})
+        if batch_mode:
+            # Queue the question until the batch is sent
+            st.session_state.pending_questions.append(prompt)
+        else:
+            # Add user message to chat history and show it straight away
+            st.session_state.chat_history.append({"role": "user", "content": prompt})
+            with chat_container:
+                with st.chat_message("user"):
+                    st.markdown(prompt)
+            
+            # Route to the single most relevant paper, falling back to ranked context
+            with st.spinner("Finding the most relevant paper..."):
+                selected = assistant.route_paper(prompt, st.session_state.papers_data, model=routing_model)
+            if selected:
+                context = build_papers_context([selected])
+            else:
+                context = build_papers_context(st.session_state.papers_data, prompt)
+            
+            # Stream Claude's response as it is generated
+            with chat_container:
+                with st.chat_message("assistant"):
+                    placeholder = st.empty()
+                    response = assistant.chat_with_claude(prompt, context, placeholder, model=answer_model)
+                    # Error and not-configured replies are returned without being streamed
+                    placeholder.markdown(response)
+            
+            # Add assistant response to chat history
+            st.session_state.chat_history.append({"role": "assistant", "content": response})
+    
+    # Pending batch
+    if st.session_state.pending_questions:
+        pending_area = st.empty()
+        with pending_area.container():
+            st.write("**Queued questions:**")
+            for i, question in enumerate(st.session_state.pending_questions, 1):
+                st.write(f"{i}. {question}")
+            send_batch = st.button("📨 Send batch")
         
-        # Rerun to display new messages
-        st.rerun()
+        if send_batch:
+            questions = st.session_state.pending_questions
+            context = build_papers_context(st.session_state.papers_data, "\n".join(questions))
+            
+            with st.spinner(f"Claude is answering {len(questions)} questions..."):
+                answers = assistant.chat_with_claude_batch(questions, context, model=answer_model)
+            
+            # Render the answered batch inline instead of rerunning the script
+            pending_area.empty()
+            for question, answer in zip(questions, answers):
+                st.session_state.chat_history.append({"role": "user", "content": question})
+                st.session_state.chat_history.append({"role": "assistant", "content": answer})
+                with chat_container:
+                    with st.chat_message("user"):
+                        st.markdown(question)
+                    with st.chat_message("assistant"):
+                        st.markdown(answer)
+            st.session_state.pending_questions = []
     
-    # Clear chat button
-    if st.button("🗑️ Clear Chat"):
-        st.session_state.chat_history = []
-        st.rerun()
+    # Clear chat button; the callback runs before the script, so history is already empty when it renders
+    st.button("🗑️ Clear Chat", on_click=_clear_chat)
 
 with tab3:
     st.header("Paper Analysis")
     
     if st.session_state.papers_data:
-        papers_df = pd.DataFrame(st.session_state.papers_data)
+        papers_df = _papers_df(st.session_state.papers_data)
+        # Unparseable dates (e.g. a missing <published>) are dropped, not fatal
+        years = pd.to_datetime(papers_df['published'], errors='coerce').dt.year.dropna().astype('int16')
         
         # Summary statistics
         col1, col2, col3 = st.columns(3)
         with col1:
             st.metric("Total Papers", len(papers_df))
         with col2:
-            avg_authors = papers_df['authors'].apply(len).mean()
+            avg_authors = sum(map(len, papers_df['authors'])) / len(papers_df)
             st.metric("Avg Authors", f"{avg_authors:.1f}")
         with col3:
-            years = papers_df['published'].apply(lambda x: x.split('-')[0]).value_counts()
-            st.metric("Most Common Year", years.index[0] if len(years) > 0 else "N/A")
+            st.metric("Most Common Year", str(years.mode().iat[0]) if len(years) > 0 else "N/A")
         
         # Publication timeline
         st.subheader("📅 Publication Timeline")
-        years_df = papers_df['published'].apply(lambda x: x.split('-')[0]).value_counts().sort_index()
-        st.bar_chart(years_df)
+        st.bar_chart(years.value_counts().sort_index())
         
         # Authors analysis
         st.subheader("👥 Top Authors")
-        all_authors = []
-        for authors_list in papers_df['authors']:
-            all_authors.extend(authors_list)
+        author_counts = Counter(chain.from_iterable(papers_df['authors'])).most_common(10)
         
-        if all_authors:
-            author_counts = pd.Series(all_authors).value_counts().head(10)
-            st.bar_chart(author_counts)
+        if author_counts:
+            st.bar_chart(pd.Series(dict(author_counts)))
         
         # Categories
         st.subheader("🏷️ Research Categories")
-        all_categories = []
-        for categories_list in papers_df['categories']:
-            all_categories.extend(categories_list)
+        category_counts = Counter(chain.from_iterable(papers_df['categories'])).most_common(10)
         
-        if all_categories:
-            category_counts = pd.Series(all_categories).value_counts().head(10)
-            st.bar_chart(category_counts)
+        if category_counts:
+            st.bar_chart(pd.Series(dict(category_counts)))
         
         # Download data
         st.subheader("💾 Download Data")
-        csv = papers_df.to_csv(index=False)
         st.download_button(
             label="📥 Download as CSV",
-            data=csv,
+            data=_papers_csv(st.session_state.papers_data),
             file_name=f"research_papers_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
             mime="text/csv"
         )